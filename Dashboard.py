@@ -1,173 +1,158 @@
+import cProfile
+import os
+
 import streamlit as st
 import pandas as pd
 
-# --------------------------------------------------
-# PAGE CONFIG
-# --------------------------------------------------
-st.set_page_config(
-    page_title="Jhagadiya BESS Decision Dashboard",
-    layout="wide"
+from bess_core import (
+    DATA_FILE, SIMULATE_STATS, compute_kpis, load_data, logger, simulate
 )
 
-st.title("🔋 Jhagadiya BESS Decision Dashboard")
-st.caption("PV vs Grid charging | Date filter | Optimal decision logic")
-
 # --------------------------------------------------
-# LOAD DATA
+# CHART DATA
 # --------------------------------------------------
-@st.cache_data
-def load_data():
-    df = pd.read_excel("Usage Data.xlsx", header=None)
-    df.columns = df.iloc[1]
-    df = df[2:].reset_index(drop=True)
-
-    df = df.rename(columns={
-        "Current Demand(kWh)(3000 MF)": "Demand",
-        "Solar Data(50% for Jhaghadiya)": "Solar",
-        "Imp": "Import",
-        "Exp": "Export"
-    })
-
-    for c in ["Demand", "Solar", "Import", "Export"]:
-        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
-
-    df["Datetime"] = pd.to_datetime(
-        df["Date"].astype(str) + " " + df["Time"].astype(str)
-    )
+def downsample(df, max_points=2000):
+    # A year of 15-min rows is far more than a chart can show; average into
+    # the finest bucket that fits. KPIs and the verdict keep the full data.
+    if len(df) <= max_points:
+        return df
 
-    return df
+    span = df.index[-1] - df.index[0]
+    rule = next(
+        (r for r in ["1h", "6h", "1D"] if span / pd.Timedelta(r) <= max_points),
+        "7D"
+    )
 
-df = load_data()
+    return df.resample(rule).mean()
 
 # --------------------------------------------------
-# SIDEBAR CONTROLS
+# RESULTS
 # --------------------------------------------------
-st.sidebar.header("⚙ Controls")
+# Rendered as a fragment so widgets placed inside it rerun only this
+# block, not the data load and simulation above.
+@st.fragment
+def render_results(df):
+    # KPIs
+    c1, c2, c3, c4, c5, c6 = st.columns(6)
 
-date_range = st.sidebar.date_input(
-    "📅 Date Range",
-    [df["Datetime"].min().date(), df["Datetime"].max().date()]
-)
+    sums = compute_kpis(df)
 
-battery_mwh = st.sidebar.selectbox(
-    "🔋 Battery Size (MWh)",
-    [10, 15]
-)
+    c1.metric("Demand (kWh)", f"{sums['Demand']:,.0f}")
+    c2.metric("Solar (kWh)", f"{sums['Solar']:,.0f}")
+    c3.metric("Import (kWh)", f"{sums['Import']:,.0f}")
+    c4.metric("Export (kWh)", f"{sums['Export']:,.0f}")
+    c5.metric("PV → BESS (kWh)", f"{sums['PV_Charge']:,.0f}")
+    c6.metric("Grid → BESS (kWh)", f"{sums['Grid_Charge']:,.0f}")
 
-battery_mw = 5 if battery_mwh == 10 else 7.5
+    chart_df = downsample(df)
 
-charge_mode = st.sidebar.radio(
-    "🔌 Charging Mode",
-    ["PV ONLY", "GRID ONLY", "PV + GRID"]
-)
+    # DEMAND vs SOLAR
+    st.subheader("Demand vs Solar")
+    st.line_chart(chart_df[["Demand", "Solar"]])
 
-# --------------------------------------------------
-# FILTER DATA
-# --------------------------------------------------
-df = df[
-    (df["Datetime"].dt.date >= date_range[0]) &
-    (df["Datetime"].dt.date <= date_range[1])
-].copy()
+    # BATTERY CHARGE / DISCHARGE
+    st.subheader("Battery Charge / Discharge")
+    st.bar_chart(chart_df[["PV_Charge", "Grid_Charge", "Discharge"]])
 
-# --------------------------------------------------
-# BATTERY SIMULATION
-# --------------------------------------------------
-CAP = battery_mwh * 1000
-PWR = battery_mw * 1000 / 4
+    # SOC (%)
+    st.subheader("State of Charge (%)")
+    st.line_chart(chart_df[["SOC_%"]])
 
-soc = 0
-pv_chg, grid_chg, dis, soc_pct = [], [], [], []
+    # DECISION LOGIC
+    pv_tot = sums["PV_Charge"]
+    grid_tot = sums["Grid_Charge"]
+    exp_tot = sums["Export"]
+    chg_tot = pv_tot + grid_tot
 
-for _, r in df.iterrows():
-    excess = max(r["Solar"] - r["Demand"], 0)
-    deficit = max(r["Demand"] - r["Solar"], 0)
+    export_avoided_pct = pv_tot / exp_tot * 100 if exp_tot > 0 else 0
 
-    pv = grid = 0
+    avg_soc = df["SOC_%"].mean()
+    grid_dependency = grid_tot / chg_tot * 100 if chg_tot > 0 else 0
 
-    if charge_mode == "PV ONLY":
-        pv = min(excess, PWR, CAP - soc)
-    elif charge_mode == "GRID ONLY":
-        grid = min(PWR, CAP - soc)
-    else:
-        pv = min(excess, PWR, CAP - soc)
-        rem = PWR - pv
-        if rem > 0:
-            grid = min(rem, CAP - soc - pv)
+    st.subheader("🧠 Decision Verdict")
 
-    discharge = min(deficit, PWR, soc)
-    soc += pv + grid - discharge
+    if export_avoided_pct > 60 and avg_soc > 65 and grid_dependency < 40:
+        st.success(
+            f"✅ OPTIMAL\n\n"
+            f"• Export avoided: {export_avoided_pct:.1f}%\n"
+            f"• Avg SOC: {avg_soc:.1f}%\n"
+            f"• Grid charging: {grid_dependency:.1f}%"
+        )
+    else:
+        st.warning(
+            f"⚠ NOT OPTIMAL\n\n"
+            f"• Export avoided: {export_avoided_pct:.1f}%\n"
+            f"• Avg SOC: {avg_soc:.1f}%\n"
+            f"• Grid charging: {grid_dependency:.1f}%\n\n"
+            f"Reason: Low export utilization or high grid dependency"
+        )
+
+# --------------------------------------------------
+# PAGE
+# --------------------------------------------------
+def main():
+    # PAGE CONFIG
+    st.set_page_config(
+        page_title="Jhagadiya BESS Decision Dashboard",
+        layout="wide"
+    )
 
-    pv_chg.append(pv)
-    grid_chg.append(grid)
-    dis.append(discharge)
-    soc_pct.append((soc / CAP) * 100)
+    st.title("🔋 Jhagadiya BESS Decision Dashboard")
+    st.caption("PV vs Grid charging | Date filter | Optimal decision logic")
 
-df["PV_Charge"] = pv_chg
-df["Grid_Charge"] = grid_chg
-df["Discharge"] = dis
-df["SOC_%"] = soc_pct
+    # LOAD DATA
+    source_mtime = os.path.getmtime(DATA_FILE)
+    df = load_data(source_mtime)
 
-# --------------------------------------------------
-# KPIs
-# --------------------------------------------------
-c1, c2, c3, c4, c5, c6 = st.columns(6)
+    # SIDEBAR CONTROLS
+    st.sidebar.header("⚙ Controls")
 
-c1.metric("Demand (kWh)", f"{df['Demand'].sum():,.0f}")
-c2.metric("Solar (kWh)", f"{df['Solar'].sum():,.0f}")
-c3.metric("Import (kWh)", f"{df['Import'].sum():,.0f}")
-c4.metric("Export (kWh)", f"{df['Export'].sum():,.0f}")
-c5.metric("PV → BESS (kWh)", f"{df['PV_Charge'].sum():,.0f}")
-c6.metric("Grid → BESS (kWh)", f"{df['Grid_Charge'].sum():,.0f}")
+    date_range = st.sidebar.date_input(
+        "📅 Date Range",
+        [df.index.min().date(), df.index.max().date()]
+    )
 
-# --------------------------------------------------
-# DEMAND vs SOLAR
-# --------------------------------------------------
-st.subheader("Demand vs Solar")
-st.line_chart(df.set_index("Datetime")[["Demand", "Solar"]])
+    battery_mwh = st.sidebar.selectbox(
+        "🔋 Battery Size (MWh)",
+        [10, 15]
+    )
 
-# --------------------------------------------------
-# BATTERY CHARGE / DISCHARGE
-# --------------------------------------------------
-st.subheader("Battery Charge / Discharge")
-st.bar_chart(
-    df.set_index("Datetime")[["PV_Charge", "Grid_Charge", "Discharge"]]
-)
+    battery_mw = 5 if battery_mwh == 10 else 7.5
 
-# --------------------------------------------------
-# SOC (%)
-# --------------------------------------------------
-st.subheader("State of Charge (%)")
-st.line_chart(df.set_index("Datetime")[["SOC_%"]])
+    charge_mode = st.sidebar.radio(
+        "🔌 Charging Mode",
+        ["PV ONLY", "GRID ONLY", "PV + GRID"]
+    )
 
-# --------------------------------------------------
-# DECISION LOGIC
-# --------------------------------------------------
-export_avoided_pct = (
-    df["PV_Charge"].sum() / df["Export"].sum() * 100
-    if df["Export"].sum() > 0 else 0
-)
+    # BATTERY SIMULATION
+    misses = SIMULATE_STATS["misses"]
+    df = simulate(
+        source_mtime, battery_mwh, battery_mw, charge_mode,
+        date_range[0], date_range[1]
+    )
+    SIMULATE_STATS["runs"] += 1
+    logger.info(
+        "simulate cache %s: %s MWh, %s, %s to %s (%d misses in %d runs)",
+        "miss" if SIMULATE_STATS["misses"] > misses else "hit",
+        battery_mwh, charge_mode, date_range[0], date_range[1],
+        SIMULATE_STATS["misses"], SIMULATE_STATS["runs"]
+    )
 
-avg_soc = df["SOC_%"].mean()
-grid_dependency = (
-    df["Grid_Charge"].sum() /
-    (df["PV_Charge"].sum() + df["Grid_Charge"].sum()) * 100
-    if (df["PV_Charge"].sum() + df["Grid_Charge"].sum()) > 0 else 0
-)
+    render_results(df)
 
-st.subheader("🧠 Decision Verdict")
 
-if export_avoided_pct > 60 and avg_soc > 65 and grid_dependency < 40:
-    st.success(
-        f"✅ OPTIMAL\n\n"
-        f"• Export avoided: {export_avoided_pct:.1f}%\n"
-        f"• Avg SOC: {avg_soc:.1f}%\n"
-        f"• Grid charging: {grid_dependency:.1f}%"
-    )
+# --------------------------------------------------
+# PROFILING
+# --------------------------------------------------
+# PROFILE=1 streamlit run Dashboard.py  -> each run writes prof.out (snakeviz)
+# For sampling a live app: py-spy record -o flame.svg -- streamlit run Dashboard.py
+if os.getenv("PROFILE"):
+    profiler = cProfile.Profile()
+    try:
+        # runcall() disables the profiler even when the run raises, including
+        # Streamlit's own st.stop() and rerun interruptions
+        profiler.runcall(main)
+    finally:
+        profiler.dump_stats("prof.out")
 else:
-    st.warning(
-        f"⚠ NOT OPTIMAL\n\n"
-        f"• Export avoided: {export_avoided_pct:.1f}%\n"
-        f"• Avg SOC: {avg_soc:.1f}%\n"
-        f"• Grid charging: {grid_dependency:.1f}%\n\n"
-        f"Reason: Low export utilization or high grid dependency"
-    )
+    main()
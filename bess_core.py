@@ -0,0 +1,230 @@
+import contextlib
+import os
+
+import streamlit as st
+from streamlit.logger import get_logger
+import pandas as pd
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:  # numba is optional; the kernel then runs as plain Python
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+# Streamlit's logger follows `streamlit run --logger.level` (default "info")
+logger = get_logger(__name__)
+
+# --------------------------------------------------
+# LOAD DATA
+# --------------------------------------------------
+DATA_FILE = "Usage Data.xlsx"
+# Bump CACHE_VERSION whenever read_workbook() changes: the cached file is
+# only checked against the workbook's mtime, not against this code. It is
+# the only cache that outlives the process, so this is all it takes.
+CACHE_VERSION = 2
+CACHE_FILE = f"Usage Data.v{CACHE_VERSION}.feather"
+
+
+def read_workbook():
+    columns = {
+        "Current Demand(kWh)(3000 MF)": "Demand",
+        "Solar Data(50% for Jhaghadiya)": "Solar",
+        "Imp": "Import",
+        "Exp": "Export"
+    }
+
+    # Row 0 holds sheet totals and row 1 the headers
+    df = pd.read_excel(
+        DATA_FILE, header=1, usecols=["Date", "Time", *columns]
+    )
+    df = df.rename(columns=columns)
+
+    for c in ["Demand", "Solar", "Import", "Export"]:
+        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(np.float32)
+
+    # Date cells arrive as datetimes and Time cells as datetime.time values,
+    # so add the time of day as a numeric offset instead of formatting and
+    # re-parsing a string per row
+    seconds = [t.hour * 3600 + t.minute * 60 + t.second for t in df["Time"]]
+    df["Datetime"] = (
+        pd.to_datetime(df["Date"]) + pd.to_timedelta(seconds, unit="s")
+    )
+
+    return df[["Datetime", "Demand", "Solar", "Import", "Export"]]
+
+
+def write_cache(df):
+    # Write beside the target and rename it into place, so a killed write
+    # never leaves a truncated file that looks newer than the workbook
+    tmp = f"{CACHE_FILE}.{os.getpid()}.tmp"
+    try:
+        df.to_feather(tmp)
+        os.replace(tmp, CACHE_FILE)
+    except OSError:
+        # read-only checkout: fall back to parsing the workbook
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+
+
+@st.cache_data
+def load_data(source_mtime):
+    # Parsing the workbook with openpyxl dominates start-up, so the cleaned
+    # columns are kept next to it as Feather until the workbook changes.
+    df = None
+    if os.path.exists(CACHE_FILE) and os.path.getmtime(CACHE_FILE) > source_mtime:
+        try:
+            df = pd.read_feather(CACHE_FILE)
+        except (OSError, ValueError):  # pyarrow's ArrowInvalid is a ValueError
+            df = None
+
+    if df is None:
+        df = read_workbook()
+        write_cache(df)
+
+    # A sorted DatetimeIndex lets simulate() slice date ranges by bisection
+    df = df.set_index("Datetime")
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+
+    return df
+
+
+# --------------------------------------------------
+# BATTERY SIMULATION
+# --------------------------------------------------
+# Kept out of Dashboard.py: Streamlit re-executes the page script on every
+# rerun, which would hand numba a fresh function to compile each time.
+# The charging mode is fixed for a whole run, so each mode gets its own
+# kernel and the choice is made once instead of on every 15-min step.
+# GRID ONLY has no cumsum closed form either: discharge is capped by the
+# current SOC, so the recursion stays sequential in every mode.
+
+
+@njit(cache=True)
+def _sim_pv_only(excess, deficit, cap, pwr, pv_chg, grid_chg, dis, soc_pct):
+    soc = 0.0
+    for i in range(len(soc_pct)):
+        pv = min(excess[i], pwr, cap - soc)
+        discharge = min(deficit[i], pwr, soc)
+        soc += pv - discharge
+
+        pv_chg[i] = pv
+        grid_chg[i] = 0.0
+        dis[i] = discharge
+        soc_pct[i] = (soc / cap) * 100
+
+
+@njit(cache=True)
+def _sim_grid_only(excess, deficit, cap, pwr, pv_chg, grid_chg, dis, soc_pct):
+    soc = 0.0
+    for i in range(len(soc_pct)):
+        grid = min(pwr, cap - soc)
+        discharge = min(deficit[i], pwr, soc)
+        soc += grid - discharge
+
+        pv_chg[i] = 0.0
+        grid_chg[i] = grid
+        dis[i] = discharge
+        soc_pct[i] = (soc / cap) * 100
+
+
+@njit(cache=True)
+def _sim_pv_grid(excess, deficit, cap, pwr, pv_chg, grid_chg, dis, soc_pct):
+    soc = 0.0
+    for i in range(len(soc_pct)):
+        pv = min(excess[i], pwr, cap - soc)
+        grid = 0.0
+        rem = pwr - pv
+        if rem > 0:
+            grid = min(rem, cap - soc - pv)
+
+        discharge = min(deficit[i], pwr, soc)
+        soc += pv + grid - discharge
+
+        pv_chg[i] = pv
+        grid_chg[i] = grid
+        dis[i] = discharge
+        soc_pct[i] = (soc / cap) * 100
+
+
+SIMULATORS = {
+    "PV ONLY": _sim_pv_only,
+    "GRID ONLY": _sim_grid_only,
+    "PV + GRID": _sim_pv_grid,
+}
+
+
+def simulate_battery(excess, deficit, cap, pwr, charge_mode):
+    # Kernels write straight into preallocated float32 columns
+    n = len(excess)
+    pv_chg = np.empty(n, dtype=np.float32)
+    grid_chg = np.empty(n, dtype=np.float32)
+    dis = np.empty(n, dtype=np.float32)
+    soc_pct = np.empty(n, dtype=np.float32)
+
+    SIMULATORS[charge_mode](
+        excess, deficit, cap, pwr, pv_chg, grid_chg, dis, soc_pct
+    )
+
+    return pv_chg, grid_chg, dis, soc_pct
+
+
+# simulate() bumps "misses" only when its body runs; callers compare it
+# around a call to tell hits from misses (see Dashboard.py main()). The
+# counts are process-wide, so overlapping sessions can blur the label.
+SIMULATE_STATS = {"runs": 0, "misses": 0}
+
+
+# Each entry holds up to a year of rows, so keep only recent configurations
+@st.cache_data(max_entries=32, show_spinner="Simulating battery...")
+def simulate(source_mtime, battery_mwh, battery_mw, charge_mode,
+             start_date, end_date):
+    # Only reached on a cache miss
+    SIMULATE_STATS["misses"] += 1
+
+    df = load_data(source_mtime)
+    lo, hi = df.index.searchsorted([
+        pd.Timestamp(start_date),
+        pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    ])
+    df = df.iloc[lo:hi].copy()
+
+    CAP = battery_mwh * 1000
+    PWR = battery_mw * 1000 / 4
+
+    solar = df["Solar"].to_numpy(dtype=np.float64)
+    demand = df["Demand"].to_numpy(dtype=np.float64)
+    excess = np.maximum(solar - demand, 0.0)
+    deficit = np.maximum(demand - solar, 0.0)
+
+    if not HAVE_NUMBA:
+        # Interpreted fallback: plain floats index far faster than NumPy scalars
+        excess, deficit = excess.tolist(), deficit.tolist()
+
+    pv_chg, grid_chg, dis, soc_pct = simulate_battery(
+        excess, deficit, float(CAP), float(PWR), charge_mode
+    )
+
+    df["PV_Charge"] = pv_chg
+    df["Grid_Charge"] = grid_chg
+    df["Discharge"] = dis
+    df["SOC_%"] = soc_pct
+
+    return df
+
+
+# --------------------------------------------------
+# KPIs
+# --------------------------------------------------
+def compute_kpis(df):
+    # Columns are stored as float32; accumulate in float64 so yearly totals
+    # don't pick up float32 rounding in the displayed kWh
+    return df[[
+        "Demand", "Solar", "Import", "Export", "PV_Charge", "Grid_Charge"
+    ]].astype(np.float64).sum().to_dict()